@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
+import json
 import os
+import shutil
 
 # Set up basic configuration
 st.set_page_config(layout="wide")
@@ -10,42 +12,73 @@ st.set_page_config(layout="wide")
 UPLOAD_FOLDER = 'uploads'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-def load_and_process_data(filepath):
-    # Read and process CSV file
-    df = pd.read_csv(filepath, header=None, dtype=str)
-    headers = df.iloc[0].astype(str).str.strip()
-    df = df[1:].reset_index(drop=True)
-    df.columns = headers
-    
-    # Clean and convert data
-    df.replace('-', pd.NA, inplace=True)
+# Columns a candlestick trace needs
+REQUIRED_OHLC = frozenset(['Open', 'High', 'Low', 'Close'])
+
+@st.cache_data(show_spinner=False)
+def load_and_process_data(filepath, mtime):
+    # Read and process CSV file (mtime keys the cache so edits invalidate it)
+    df = pd.read_csv(filepath, header=0, dtype=str, na_values=['-'], engine='pyarrow')
+    df.columns = df.columns.astype(str).str.strip()
+
+    # Clean and convert data ('-' already mapped to NaN by the parser)
     df.dropna(inplace=True)
     numeric_columns = ['Open', 'High', 'Low', 'Close', 'LTP', 'Strike Price']
-    for col in numeric_columns:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-    
+    cols = [col for col in numeric_columns if col in df.columns]
+    # Coerce and downcast in one pass per column; NSE prices stay well
+    # under 1e5, so float32 precision is ample and the hot paths touch
+    # half as many bytes
+    df[cols] = df[cols].apply(lambda s: pd.to_numeric(s, errors='coerce').astype('float32'))
+
+    # Dict-encode the low-cardinality string columns (applied after the
+    # header strip, since the raw CSV headers carry trailing spaces)
+    cat_cols = [col for col in ('Symbol', 'Expiry', 'Option type', 'Option Type') if col in df.columns]
+    df[cat_cols] = df[cat_cols].astype('category')
+
+    # Parse and sort dates once at ingest so chart renders skip both steps;
+    # mergesort is near-linear on the mostly-sorted order NSE exports use
+    if 'Date' in df.columns:
+        df['Date'] = pd.to_datetime(df['Date'], format='%d-%b-%Y', cache=True, errors='coerce')
+        if not df['Date'].is_monotonic_increasing:
+            df.sort_values(by='Date', inplace=True, kind='mergesort')
+
+    return df
+
+@st.cache_data(show_spinner=False)
+def load_dataframe(filepath, mtime):
+    # Serve the processed frame from memory on reruns (mtime keys the cache);
+    # the Parquet sidecar only speeds up the cold first load after a restart
+    parquet_path = filepath + '.parquet'
+    if os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= mtime:
+        return pd.read_parquet(parquet_path, engine='pyarrow')
+    df = load_and_process_data(filepath, mtime)
+    df.to_parquet(parquet_path, engine='pyarrow', compression='zstd')
     return df
 
+@st.cache_data(show_spinner=False)
+def get_contract_groups(filepath, mtime):
+    # One groupby per upload so chart renders are dict lookups, not column scans
+    df = load_dataframe(filepath, mtime)
+    if 'Expiry' not in df.columns or 'Strike Price' not in df.columns:
+        return {}
+    return dict(tuple(df.groupby(['Expiry', 'Strike Price'], sort=False, observed=True)))
+
 def create_candlestick_chart(df, expiry, strike, instrument):
-    # Filter data
-    if 'Expiry' in df.columns and 'Strike Price' in df.columns:
-        df = df[(df['Expiry'] == expiry) & (df['Strike Price'] == float(strike))]
-    
-    # Process dates
-    if 'Date' in df.columns:
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-        df.sort_values(by='Date', inplace=True)
-    
-    # Create candlestick chart
+    # Downsample long histories to weekly bars to keep the payload and SVG small
+    if len(df) > 2000 and 'Date' in df.columns:
+        df = df.set_index('Date').resample('W').agg(
+            {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last'}
+        ).dropna().reset_index()
+
+    # Create candlestick chart (dates already parsed and sorted at ingest)
     fig = go.Figure()
-    if all(col in df.columns for col in ['Open', 'High', 'Low', 'Close']):
+    if REQUIRED_OHLC.issubset(df.columns):
         fig.add_trace(go.Candlestick(
-            x=df['Date'],
-            open=df['Open'],
-            high=df['High'],
-            low=df['Low'],
-            close=df['Close'],
+            x=df['Date'].to_numpy(),
+            open=df['Open'].to_numpy(dtype='float32'),
+            high=df['High'].to_numpy(dtype='float32'),
+            low=df['Low'].to_numpy(dtype='float32'),
+            close=df['Close'].to_numpy(dtype='float32'),
             name='Candlestick Chart',
             increasing=dict(line=dict(color='#26a69a')),
             decreasing=dict(line=dict(color='#ef5350'))
@@ -63,11 +96,39 @@ def create_candlestick_chart(df, expiry, strike, instrument):
         yaxis=dict(gridcolor='#333'),
         dragmode='pan',
         autosize=True,
-        height=600
+        height=600,
+        uirevision='static'
     )
-    
+
     return fig
 
+@st.cache_data(show_spinner=False)
+def get_chart_json(filepath, mtime, expiry, strike, instrument):
+    # Serve the serialized figure from cache so unchanged selections skip
+    # both the figure build and the Python-side JSON encode
+    sub_df = get_contract_groups(filepath, mtime).get((expiry, float(strike)))
+    if sub_df is None:
+        return None
+    return create_candlestick_chart(sub_df, expiry, strike, instrument).to_json()
+
+@st.fragment
+def chart_panel(df, filepath, instrument):
+    # Only this block reruns when expiry/strike change, not the whole script
+    col1, col2 = st.columns(2)
+    with col1:
+        expiry_dates = df['Expiry'].unique() if 'Expiry' in df.columns else []
+        selected_expiry = st.selectbox("Select Expiry Date", options=expiry_dates)
+
+    with col2:
+        strike_prices = df['Strike Price'].unique() if 'Strike Price' in df.columns else []
+        selected_strike = st.selectbox("Select Strike Price", options=strike_prices)
+
+    # Generate and display chart
+    if selected_expiry and selected_strike:
+        chart_json = get_chart_json(filepath, os.path.getmtime(filepath), selected_expiry, selected_strike, instrument)
+        if chart_json is not None:
+            st.plotly_chart(json.loads(chart_json), use_container_width=True, config={"scrollZoom": True})
+
 def main():
     st.title("Option Chart Generator")
     
@@ -75,31 +136,26 @@ def main():
     uploaded_file = st.file_uploader("Upload CSV file", type=['csv'])
     
     if uploaded_file is not None:
-        # Save uploaded file
+        # Save uploaded file. Skip rewriting on plain reruns so the
+        # mtime-keyed caches stay stable, but write whenever a new upload
+        # arrives: file_id changes per upload, so same-name same-size
+        # re-uploads with edited content are still picked up
         filepath = os.path.join(UPLOAD_FOLDER, uploaded_file.name)
-        with open(filepath, 'wb') as f:
-            f.write(uploaded_file.getbuffer())
-        
+        if not os.path.exists(filepath) or st.session_state.get('_saved_file_id') != uploaded_file.file_id:
+            # Stream in 1 MiB chunks rather than materializing the whole upload
+            uploaded_file.seek(0)
+            with open(filepath, 'wb') as f:
+                shutil.copyfileobj(uploaded_file, f, length=1 << 20)
+            st.session_state._saved_file_id = uploaded_file.file_id
+
         # Load and process data
-        df = load_and_process_data(filepath)
+        df = load_dataframe(filepath, os.path.getmtime(filepath))
         
         # Get instrument name from filename
         instrument = uploaded_file.name.split('_')[1].split('.')[0]
         
-        # Selection options
-        col1, col2 = st.columns(2)
-        with col1:
-            expiry_dates = df['Expiry'].unique() if 'Expiry' in df.columns else []
-            selected_expiry = st.selectbox("Select Expiry Date", options=expiry_dates)
-        
-        with col2:
-            strike_prices = df['Strike Price'].unique() if 'Strike Price' in df.columns else []
-            selected_strike = st.selectbox("Select Strike Price", options=strike_prices)
-        
-        # Generate and display chart
-        if selected_expiry and selected_strike:
-            fig = create_candlestick_chart(df, selected_expiry, selected_strike, instrument)
-            st.plotly_chart(fig, use_container_width=True, config={"scrollZoom": True})
+        # Selection options and chart live in a fragment for partial reruns
+        chart_panel(df, filepath, instrument)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
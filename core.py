@@ -3,24 +3,69 @@ import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import cloudscraper
-import time
+import os
+import pickle
 
 # Set up basic configuration
 st.set_page_config(layout="wide")
 
-# Create CloudScraper instance
-scraper = cloudscraper.create_scraper()
-
 # NSE API endpoint
 url = "https://www.nseindia.com/api/historical/foCPV"
 
-# Load ticker symbols from CSV
+# Cloudflare cookies persisted here so restarts skip the warm-up GETs
+COOKIE_FILE = os.path.join('uploads', '.nse_cookies')
+
+@st.cache_resource(show_spinner=False)
+def get_scraper():
+    """One CloudScraper per process, seeded with any cookies saved on disk."""
+    s = cloudscraper.create_scraper()
+    try:
+        with open(COOKIE_FILE, 'rb') as f:
+            s.cookies.update(pickle.load(f))
+        s._warmed = True
+    except (OSError, pickle.PickleError, EOFError):
+        pass
+    return s
+
+# Request headers shared by the warm-up and API calls
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "application/json",
+    "Referer": "https://www.nseindia.com/",
+    "X-Requested-With": "XMLHttpRequest"
+}
+
+def warm_up_scraper(force=False):
+    """Acquire NSE cookies once; later fetches reuse the kept-alive session."""
+    scraper = get_scraper()
+    if getattr(scraper, '_warmed', False) and not force:
+        return True
+    response = scraper.get("https://www.nseindia.com/", headers=HEADERS)
+    if response.status_code != 200:
+        st.error(f"Failed to load homepage: {response.status_code}")
+        return False
+    scraper.get("https://www.nseindia.com/market-data/equity-derivatives-watch", headers=HEADERS)
+    scraper._warmed = True
+    try:
+        os.makedirs(os.path.dirname(COOKIE_FILE), exist_ok=True)
+        with open(COOKIE_FILE, 'wb') as f:
+            pickle.dump(scraper.cookies, f)
+    except OSError:
+        pass
+    return True
+
+# Load ticker symbols from CSV, once per Streamlit process
+@st.cache_resource(show_spinner=False)
+def load_symbols(path):
+    return pd.read_csv(path, usecols=["SYMBOL"], engine="pyarrow")["SYMBOL"].dropna().unique().tolist()
+
 try:
-    ticker_df = pd.read_csv("tickers.csv")
-    if "SYMBOL" not in ticker_df.columns:
-        st.error("The 'tickerS.csv' file must contain a 'SYMBOL' column.")
-        st.stop()
-    STOCK_SYMBOLS = ticker_df["SYMBOL"].dropna().unique().tolist()
+    STOCK_SYMBOLS = load_symbols("tickers.csv")
+except (ValueError, KeyError):
+    # The pyarrow engine reports a missing usecols column as ArrowKeyError
+    # (a KeyError), where the c engine raises ValueError
+    st.error("The 'tickerS.csv' file must contain a 'SYMBOL' column.")
+    st.stop()
 except FileNotFoundError:
     st.error("tickerS.csv file not found. Please ensure it exists in the same directory.")
     st.stop()
@@ -37,6 +82,23 @@ PREDEFINED_EXPIRY_DATES = [
 
 PREDEFINED_INSTRUMENTS_TYPE = ["OPTSTK", "OPTIDX", "FUTIDX", "FUTSTK", "FUTIVX"]
 
+# Columns a candlestick trace needs
+REQUIRED_OHLC = frozenset(['Open', 'High', 'Low', 'Close'])
+
+# NSE response fields we keep, and their display names
+NSE_COLUMN_MAP = {
+    "FH_TIMESTAMP": "Date",
+    "FH_OPENING_PRICE": "Open",
+    "FH_TRADE_HIGH_PRICE": "High",
+    "FH_TRADE_LOW_PRICE": "Low",
+    "FH_CLOSING_PRICE": "Close",
+    "FH_LAST_TRADED_PRICE": "LTP",
+    "FH_STRIKE_PRICE": "Strike Price",
+    "FH_EXPIRY_DT": "Expiry",
+    "FH_OPTION_TYPE": "Option Type",
+    "FH_UNDERLYING_VALUE": "Underlying"
+}
+
 # Predefined durations (optional)
 PREDEFINED_DURATIONS = ["Custom", "1D", "1W", "1M", "1.5M", "3M"]  # Custom as default
 
@@ -55,6 +117,11 @@ def calculate_from_date(to_date, duration):
     else:  # Custom
         return None  # Let user set manually
 
+class NSEFetchError(Exception):
+    """Fetch failure. Raised (not returned) so st.cache_data never memoizes
+    an error; a recovered network can then succeed on the next click."""
+
+@st.cache_data(ttl=3600, show_spinner=False)
 def fetch_nse_data(from_date, to_date, symbol, year, expiry_date, option_type, strike_price, instrument_type):
     from_date_str = from_date.strftime("%d-%m-%Y")
     to_date_str = to_date.strftime("%d-%m-%Y")
@@ -71,59 +138,53 @@ def fetch_nse_data(from_date, to_date, symbol, year, expiry_date, option_type, s
         "strikePrice": str(strike_price)
     }   
     
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Accept": "application/json",
-        "Referer": "https://www.nseindia.com/",
-        "X-Requested-With": "XMLHttpRequest"
-    }
-
-    st.write("Visiting homepage...")
-    response = scraper.get("https://www.nseindia.com/", headers=headers)
-    if response.status_code != 200:
-        st.error(f"Failed to load homepage: {response.status_code}")
-        return None
-
-    st.write("Visiting derivatives page...")
-    scraper.get("https://www.nseindia.com/market-data/equity-derivatives-watch", headers=headers)
-    time.sleep(2)
+    if not warm_up_scraper():
+        raise NSEFetchError("Could not warm up the NSE session.")
 
     try:
-        response = scraper.get(url, params=params, headers=headers, timeout=10)
+        scraper = get_scraper()
+        response = scraper.get(url, params=params, headers=HEADERS, timeout=10)
+        if response.status_code in (401, 403):
+            # Saved cookies went stale; re-warm once and retry
+            if not warm_up_scraper(force=True):
+                raise NSEFetchError("Could not re-warm the NSE session.")
+            response = scraper.get(url, params=params, headers=HEADERS, timeout=10)
         response.raise_for_status()
         data = response.json()
         
         if "data" in data and data["data"]:
-            df = pd.DataFrame(data["data"])
-            
-            df = df.rename(columns={
-                "FH_TIMESTAMP": "Date",
-                "FH_OPENING_PRICE": "Open",
-                "FH_TRADE_HIGH_PRICE": "High",
-                "FH_TRADE_LOW_PRICE": "Low",
-                "FH_CLOSING_PRICE": "Close",
-                "FH_LAST_TRADED_PRICE": "LTP",
-                "FH_STRIKE_PRICE": "Strike Price",
-                "FH_EXPIRY_DT": "Expiry",
-                "FH_OPTION_TYPE": "Option Type",
-                "FH_UNDERLYING_VALUE": "Underlying"
-            })
+            # Project only the fields we keep while building the frame
+            df = pd.DataFrame.from_records(data["data"], columns=list(NSE_COLUMN_MAP))
+            df = df.rename(columns=NSE_COLUMN_MAP)
             
             numeric_columns = ['Open', 'High', 'Low', 'Close', 'LTP', 'Strike Price']
-            for col in numeric_columns:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
+            cols = [col for col in numeric_columns if col in df.columns]
+            # Coerce and downcast in one pass per column; float32 is ample
+            # for NSE prices
+            df[cols] = df[cols].apply(lambda s: pd.to_numeric(s, errors='coerce').astype('float32'))
+
+            # Dict-encode the low-cardinality string columns
+            cat_cols = [col for col in ('Expiry', 'Option Type') if col in df.columns]
+            df[cat_cols] = df[cat_cols].astype('category')
             
-            df.replace('-', pd.NA, inplace=True)
+            # pd.to_numeric already coerced '-' placeholders to NaN
             df.dropna(subset=['Open', 'High', 'Low', 'Close'], inplace=True)
-            
+
+            # Parse and sort dates once at ingest so chart renders skip both
+            # steps; mergesort is near-linear on NSE's reverse-chronological
+            # order, and already-sorted frames skip the sort entirely
+            if 'Date' in df.columns:
+                df['Date'] = pd.to_datetime(df['Date'], format='%d-%b-%Y', cache=True, errors='coerce')
+                if not df['Date'].is_monotonic_increasing:
+                    df.sort_values(by='Date', inplace=True, kind='mergesort')
+
             return df
         else:
-            st.error("No data found in the response.")
-            return None
+            raise NSEFetchError("No data found in the response.")
+    except NSEFetchError:
+        raise
     except Exception as e:
-        st.error(f"Error fetching data: {str(e)}")
-        return None
+        raise NSEFetchError(f"Error fetching data: {str(e)}") from e
 
 def create_candlestick_chart(df, expiry, strike, symbol):
     try:
@@ -131,18 +192,14 @@ def create_candlestick_chart(df, expiry, strike, symbol):
             st.warning("No data available for the selected criteria.")
             return None
         
-        if 'Date' in df.columns:
-            df['Date'] = pd.to_datetime(df['Date'], format='%d-%b-%Y', errors='coerce')
-            df.sort_values(by='Date', inplace=True)
-        
         fig = go.Figure()
-        if all(col in df.columns for col in ['Open', 'High', 'Low', 'Close']):
+        if REQUIRED_OHLC.issubset(df.columns):
             fig.add_trace(go.Candlestick(
-                x=df['Date'],
-                open=df['Open'],
-                high=df['High'],
-                low=df['Low'],
-                close=df['Close'],
+                x=df['Date'].to_numpy(),
+                open=df['Open'].to_numpy(dtype='float32'),
+                high=df['High'].to_numpy(dtype='float32'),
+                low=df['Low'].to_numpy(dtype='float32'),
+                close=df['Close'].to_numpy(dtype='float32'),
                 name='Candlestick Chart',
                 increasing=dict(line=dict(color='#26a69a')),
                 decreasing=dict(line=dict(color='#ef5350'))
@@ -224,7 +281,12 @@ def main():
         st.session_state.df = None
 
     if fetch_button and all_fields_filled:
-        st.session_state.df = fetch_nse_data(from_date, to_date, symbol, year, expiry_date, option_type, strike_price, instrument_type)
+        try:
+            st.session_state.df = fetch_nse_data(from_date, to_date, symbol, year, expiry_date, option_type, strike_price, instrument_type)
+        except NSEFetchError as e:
+            # Nothing was cached, so the next click refetches
+            st.error(str(e))
+            st.session_state.df = None
 
     if st.session_state.df is not None and not st.session_state.df.empty:
         fig = create_candlestick_chart(st.session_state.df, expiry_date, strike_price, symbol)
@@ -1,29 +1,45 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
+from collections import OrderedDict
 from datetime import datetime, timedelta
 import cloudscraper
+import hashlib
+import json
+import orjson
+import pathlib
 import time
 import os
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 
 # Set up basic configuration
 st.set_page_config(layout="wide")
 
-# Create CloudScraper instance
-scraper = cloudscraper.create_scraper()
+# Create CloudScraper instance behind st.cache_resource so the session, its
+# cookie jar and priming flag always survive reruns; re-creating it would
+# re-run cloudscraper's JS-challenge warm-up
+@st.cache_resource(show_spinner=False)
+def get_scraper():
+    return cloudscraper.create_scraper(browser={'browser': 'chrome', 'platform': 'windows', 'mobile': False})
+
+scraper = get_scraper()
 
 # NSE API endpoints
 historical_url = "https://www.nseindia.com/api/historicalOR/foCPV"  # Options data for charts
 historical_or_url = "https://www.nseindia.com/api/historicalOR/foCPV"  # Strike prices
 
-# Load ticker symbols from CSV
+# Load ticker symbols from CSV, once per process instead of per rerun
+@st.cache_data(show_spinner=False)
+def load_symbols(path):
+    return pd.read_csv(path, usecols=["SYMBOL"], dtype={"SYMBOL": "string"})["SYMBOL"].dropna().unique().tolist()
+
 try:
-    ticker_df = pd.read_csv("tickers.csv")
-    if "SYMBOL" not in ticker_df.columns:
-        st.error("The 'tickers.csv' file must contain a 'SYMBOL' column.")
-        st.stop()
-    STOCK_SYMBOLS = ticker_df["SYMBOL"].dropna().unique().tolist()
+    STOCK_SYMBOLS = load_symbols("tickers.csv")
+except ValueError:
+    st.error("The 'tickers.csv' file must contain a 'SYMBOL' column.")
+    st.stop()
 except FileNotFoundError:
     st.error("tickers.csv file not found. Please ensure it exists in the same directory.")
     st.stop()
@@ -34,6 +50,93 @@ except Exception as e:
 # Predefined instrument types
 PREDEFINED_INSTRUMENTS_TYPE = ["OPTSTK", "OPTIDX", "FUTIDX", "FUTSTK", "FUTIVX"]
 
+# NSE response fields we keep, and their display names
+NSE_COLUMN_MAP = {
+    "FH_TIMESTAMP": "Date",
+    "FH_OPENING_PRICE": "Open",
+    "FH_TRADE_HIGH_PRICE": "High",
+    "FH_TRADE_LOW_PRICE": "Low",
+    "FH_CLOSING_PRICE": "Close",
+    "FH_LAST_TRADED_PRICE": "LTP",
+    "FH_STRIKE_PRICE": "Strike Price",
+    "FH_EXPIRY_DT": "Expiry",
+    "FH_OPTION_TYPE": "Option Type",
+    "FH_UNDERLYING_VALUE": "Underlying",
+    "FH_TOT_TRADED_QTY": "Volume",
+    "FH_OPEN_INT": "Open Interest"
+}
+
+# Request headers shared by the priming and API calls
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "application/json",
+    "Referer": "https://www.nseindia.com/",
+    "X-Requested-With": "XMLHttpRequest"
+}
+
+# On-disk cache for finalized historical fetches; survives process restarts
+CACHE_DIR = pathlib.Path("cache")
+
+def _cache_key(**kwargs):
+    digest = hashlib.sha1(repr(sorted(kwargs.items())).encode()).hexdigest()
+    return CACHE_DIR / f"{digest}.parquet"
+
+def _ensure_primed():
+    """Run the cookie-priming GETs once per session; the jar persists, so
+    every later fetch goes straight to the API."""
+    if getattr(scraper, "_primed", False):
+        return
+    # The homepage GET alone yields every cookie the foCPV API needs; the
+    # derivatives-watch page added a round-trip without new cookies
+    scraper.get("https://www.nseindia.com/", headers=HEADERS)
+    scraper._primed = True
+
+# Conditional-GET cache: canonical query string -> (etag, parsed JSON).
+# Lives behind st.cache_resource because Streamlit re-executes this script
+# with fresh globals on every rerun; a module-level dict would be reborn
+# empty before it could ever answer a revalidation. Bounded LRU so bulk
+# strike sweeps cannot grow it without limit (matches the fetchers'
+# max_entries=256).
+_ETAG_CACHE_MAX = 256
+
+@st.cache_resource(show_spinner=False)
+def _etag_cache():
+    return OrderedDict()
+
+def get_json_conditional(url, params, request_headers, timeout=10):
+    """GET a JSON endpoint, revalidating with If-None-Match when an ETag is
+    held; a 304 serves the cached payload with no re-download or re-parse."""
+    etag_cache = _etag_cache()
+    key = f"{url}?{urllib.parse.urlencode(sorted(params.items()))}"
+    request_headers = dict(request_headers)
+    cached = etag_cache.get(key)
+    if cached is not None:
+        etag_cache.move_to_end(key)
+        request_headers["If-None-Match"] = cached[0]
+    _ensure_primed()
+    response = scraper.get(url, params=params, headers=request_headers, timeout=timeout)
+    if response.status_code in (401, 403):
+        # Cookies went stale; re-prime once and retry
+        scraper._primed = False
+        _ensure_primed()
+        response = scraper.get(url, params=params, headers=request_headers, timeout=timeout)
+    if response.status_code == 304 and cached is not None:
+        return cached[1]
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+    etag = response.headers.get("ETag")
+    if etag:
+        etag_cache[key] = (etag, data)
+        etag_cache.move_to_end(key)
+        while len(etag_cache) > _ETAG_CACHE_MAX:
+            etag_cache.popitem(last=False)
+    return data
+
+class NSEFetchError(Exception):
+    """Fetch failure. Raised (not returned) so st.cache_data never memoizes
+    an error result and the caller's session-state gates never latch one."""
+
+@st.cache_data(ttl=900, show_spinner=False, max_entries=256)
 def fetch_strike_prices(symbol, expiry_date, instrument_type, date_range_days=30, to_date=None):
     """Fetch available strike prices from historicalOR/foCPV API, with CSV fallback."""
     from_date = to_date - timedelta(days=date_range_days)
@@ -46,91 +149,110 @@ def fetch_strike_prices(symbol, expiry_date, instrument_type, date_range_days=30
     csv_date_str = expiry_date.strftime("%Y%b%d").upper()
     csv_file = f"fo_eq_security_{csv_date_str}.csv"
     
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Accept": "application/json",
-        "Referer": "https://www.nseindia.com/",
-        "X-Requested-With": "XMLHttpRequest"
-    }
-
-    strike_prices = set()
     option_types = ["CE", "PE"]
-    
+
+    def _fetch_one(option_type):
+        """Fetch strikes for one option type; runs in a worker thread, so UI
+        messages are collected and emitted by the caller."""
+        params = {
+            "from": from_date_str,
+            "to": to_date_str,
+            "instrumentType": instrument_type,
+            "symbol": symbol,
+            "year": str(year),
+            "expiryDate": expiry_date_str,
+            "optionType": option_type
+        }
+
+        # Log the full API URL
+        url = f"{historical_or_url}?{urllib.parse.urlencode(params)}"
+        strikes = set()
+        messages = [("write", f"Fetching strike prices for {symbol} {option_type} with URL: {url}")]
+
+        for attempt in range(3):
+            try:
+                data = get_json_conditional(historical_or_url, params, HEADERS)
+
+                if "data" in data and data["data"]:
+                    records = data["data"]
+                    # Project just the strike and timestamp fields per record
+                    # instead of materializing every column in a DataFrame
+                    strikes_by_day = {}
+                    all_strikes = set()
+                    for record in records:
+                        try:
+                            strike = float(record["FH_STRIKE_PRICE"])
+                        except (KeyError, TypeError, ValueError):
+                            continue
+                        all_strikes.add(strike)
+                        day = record.get("FH_TIMESTAMP")
+                        if day:
+                            strikes_by_day.setdefault(day, set()).add(strike)
+                    if strikes_by_day:
+                        # Prioritize recent strikes from the latest trading day
+                        latest_day = max(strikes_by_day, key=lambda d: datetime.strptime(d, "%d-%b-%Y"))
+                        strikes.update(strikes_by_day[latest_day])
+                    else:
+                        strikes.update(all_strikes)
+                    if not all_strikes:
+                        messages.append(("warning", f"No FH_STRIKE_PRICE column in API response for {symbol} {option_type}"))
+                    if len(records) >= 500:
+                        messages.append(("warning", f"API returned {len(records)} records for {option_type}; may be capped. Try a shorter date range or CSV fallback."))
+                else:
+                    messages.append(("warning", f"No API data for {symbol} {option_type} with expiry {expiry_date_str}. Response: {data}"))
+
+                break
+            except Exception as e:
+                messages.append(("warning", f"API attempt {attempt + 1} failed for {option_type}: {str(e)}"))
+                # Back off only on genuine failure, growing per attempt
+                time.sleep(2 ** attempt)
+                if attempt == 2:
+                    messages.append(("error", f"Failed to fetch strike prices for {option_type} via API after 3 attempts"))
+
+        return np.fromiter(strikes, dtype=np.float64, count=len(strikes)), messages
+
     # Try API first
     try:
-        scraper.get("https://www.nseindia.com/", headers=headers)
-        time.sleep(1)
-        scraper.get("https://www.nseindia.com/market-data/equity-derivatives-watch", headers=headers)
-        time.sleep(1)
-
-        for option_type in option_types:
-            params = {
-                "from": from_date_str,
-                "to": to_date_str,
-                "instrumentType": instrument_type,
-                "symbol": symbol,
-                "year": str(year),
-                "expiryDate": expiry_date_str,
-                "optionType": option_type
-            }
-            
-            # Log the full API URL
-            url = f"{historical_or_url}?{urllib.parse.urlencode(params)}"
-            st.write(f"Fetching strike prices for {symbol} {option_type} with URL: {url}")
-            
-            for attempt in range(3):
-                try:
-                    response = scraper.get(historical_or_url, params=params, headers=headers, timeout=10)
-                    #st.write(f"API attempt {attempt + 1} for {option_type} returned status code: {response.status_code}")
-                    response.raise_for_status()
-                    data = response.json()
-                    
-                    if "data" in data and data["data"]:
-                        df = pd.DataFrame(data["data"])
-                        #st.write(f"API returned {len(df)} records for {symbol} {option_type} with expiry {expiry_date_str} over {date_range_days} days")
-                        if "FH_STRIKE_PRICE" in df.columns:
-                            df["FH_STRIKE_PRICE"] = pd.to_numeric(df["FH_STRIKE_PRICE"], errors='coerce')
-                            # Prioritize recent strikes by filtering for the latest trading day
-                            if "FH_TIMESTAMP" in df.columns:
-                                df["FH_TIMESTAMP"] = pd.to_datetime(df["FH_TIMESTAMP"], format='%d-%b-%Y', errors='coerce')
-                                latest_date = df["FH_TIMESTAMP"].max()
-                                recent_df = df[df["FH_TIMESTAMP"] == latest_date]
-                                valid_strikes = recent_df["FH_STRIKE_PRICE"].dropna().tolist()
-                            else:
-                                valid_strikes = df["FH_STRIKE_PRICE"].dropna().tolist()
-                            strike_prices.update(valid_strikes)
-                            #st.write(f"Fetched {len(valid_strikes)} strike prices for {option_type} via API")
-                            if len(df) >= 500:
-                                st.warning(f"API returned {len(df)} records for {option_type}; may be capped. Try a shorter date range or CSV fallback.")
-                        else:
-                            st.warning(f"No FH_STRIKE_PRICE column in API response for {symbol} {option_type}")
-                    else:
-                        st.warning(f"No API data for {symbol} {option_type} with expiry {expiry_date_str}. Response: {data}")
-                    
-                    time.sleep(1)
-                    break
-                except Exception as e:
-                    st.warning(f"API attempt {attempt + 1} failed for {option_type}: {str(e)}")
-                    time.sleep(2)
-                    if attempt == 2:
-                        st.error(f"Failed to fetch strike prices for {option_type} via API after 3 attempts")
-        
-        if strike_prices:
+        _ensure_primed()
+
+        # CE and PE are independent requests on a warmed session; fetch them
+        # in parallel instead of serializing with a sleep in between
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(_fetch_one, option_types))
+
+        strike_arrays = []
+        for strikes, messages in results:
+            if strikes.size:
+                strike_arrays.append(strikes)
+            for level, message in messages:
+                getattr(st, level)(message)
+
+        if strike_arrays:
+            # One C-level dedupe+sort across both option types
+            strike_prices = np.unique(np.concatenate(strike_arrays))
             st.write(f"Total unique strike prices from API: {len(strike_prices)}")
-            return sorted(list(strike_prices))
+            return strike_prices.tolist()
         
         st.warning("No strike prices from API. Falling back to CSV.")
     except Exception as e:
         st.error(f"API error: {str(e)}. Falling back to CSV.")
     
-    # Fallback to CSV
+    # Fallback to CSV. Failures raise so neither st.cache_data nor the
+    # caller's _last_strike_key gate can pin a [0] sentinel; the next rerun
+    # simply retries.
     try:
         if not os.path.exists(csv_file):
-            st.error(f"CSV file {csv_file} not found. Please download from https://www.nseindia.com/report-detail/fo_eq_security.")
-            return [0]
+            raise NSEFetchError(f"CSV file {csv_file} not found. Please download from https://www.nseindia.com/report-detail/fo_eq_security.")
         
-        df = pd.read_csv(csv_file)
-        df.columns = df.columns.str.strip().str.replace(' ', '_').str.upper()
+        # Sniff the raw header row once (names may carry spaces), then parse
+        # only the five columns the filter needs, with explicit dtypes, via
+        # the multithreaded pyarrow engine
+        raw_columns = pd.read_csv(csv_file, nrows=0).columns
+        colmap = {c: c.strip().replace(' ', '_').upper() for c in raw_columns}
+        wanted = {'SYMBOL', 'INSTRUMENT', 'EXPIRY_DT', 'OPTION_TYP', 'STRIKE_PR'}
+        usecols = [c for c, norm in colmap.items() if norm in wanted]
+        dtypes = {c: 'float32' if colmap[c] == 'STRIKE_PR' else 'string' for c in usecols}
+        df = pd.read_csv(csv_file, usecols=usecols, dtype=dtypes, engine='pyarrow').rename(columns=colmap)
         
         if instrument_type in ["OPTSTK", "OPTIDX"]:
             df_filtered = df[
@@ -140,27 +262,66 @@ def fetch_strike_prices(symbol, expiry_date, instrument_type, date_range_days=30
                 (df['OPTION_TYP'].isin(['CE', 'PE']))
             ]
         else:
-            st.warning(f"Instrument type {instrument_type} not supported for CSV strike prices.")
-            return [0]
+            raise NSEFetchError(f"Instrument type {instrument_type} not supported for CSV strike prices.")
         
         if df_filtered.empty:
-            st.error(f"No CSV data for {symbol}, {instrument_type}, expiry {expiry_date_str}.")
-            return [0]
+            raise NSEFetchError(f"No CSV data for {symbol}, {instrument_type}, expiry {expiry_date_str}.")
         
         if 'STRIKE_PR' in df_filtered.columns:
             df_filtered['STRIKE_PR'] = pd.to_numeric(df_filtered['STRIKE_PR'], errors='coerce')
             strike_prices = sorted(df_filtered['STRIKE_PR'].dropna().unique().tolist())
             st.write(f"Fetched {len(strike_prices)} strike prices from CSV")
-            
-            return strike_prices if strike_prices else [0]
+
+            if not strike_prices:
+                raise NSEFetchError(f"No usable strike prices in CSV for {symbol}.")
+            return strike_prices
         else:
-            st.error("STRIKE_PR column not found in CSV.")
-            return [0]
-            
+            raise NSEFetchError("STRIKE_PR column not found in CSV.")
+
+    except NSEFetchError:
+        raise
     except Exception as e:
-        st.error(f"CSV error: {str(e)}")
-        return [0]
+        raise NSEFetchError(f"CSV error: {str(e)}") from e
+
+def fetch_strikes_bulk(symbol, combos, date_range_days=30, to_date=None, max_workers=8):
+    """Resolve strikes for several (expiry_date, instrument_type) combos in
+    one go, e.g. to build an expiry dropdown. CE/PE requests for every combo
+    run concurrently on the warmed session, capped at max_workers so NSE's
+    rate limit is respected. Returns {combo: sorted strike list}."""
+    _ensure_primed()
+
+    def _one(task):
+        (expiry_date, instrument_type), option_type = task
+        end_date = to_date if to_date is not None else expiry_date
+        params = {
+            "from": (end_date - timedelta(days=date_range_days)).strftime("%d-%m-%Y"),
+            "to": end_date.strftime("%d-%m-%Y"),
+            "instrumentType": instrument_type,
+            "symbol": symbol,
+            "year": str(end_date.year),
+            "expiryDate": expiry_date.strftime("%d-%b-%Y").upper(),
+            "optionType": option_type
+        }
+        strikes = set()
+        try:
+            data = get_json_conditional(historical_or_url, params, HEADERS)
+        except Exception:
+            return (expiry_date, instrument_type), strikes
+        for record in data.get("data") or []:
+            try:
+                strikes.add(float(record["FH_STRIKE_PRICE"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+        return (expiry_date, instrument_type), strikes
 
+    tasks = [(combo, option_type) for combo in combos for option_type in ("CE", "PE")]
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for combo, strikes in executor.map(_one, tasks):
+            results.setdefault(combo, set()).update(strikes)
+    return {combo: sorted(strikes) for combo, strikes in results.items()}
+
+@st.cache_data(ttl=900, show_spinner=False, max_entries=256)
 def fetch_nse_data(from_date, to_date, symbol, expiry_date, option_type, strike_price, instrument_type):
     """Fetch historical options data from NSE."""
     from_date_str = from_date.strftime("%d-%m-%Y")
@@ -179,58 +340,102 @@ def fetch_nse_data(from_date, to_date, symbol, expiry_date, option_type, strike_
         "strikePrice": str(strike_price)
     }
     
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Accept": "application/json",
-        "Referer": "https://www.nseindia.com/",
-        "X-Requested-With": "XMLHttpRequest"
-    }
-
     # Log the full API URL
     #urll = f"{historical_url}?{urllib.parse.urlencode(params)}"
     #st.write(f"Fetching strike prices for {symbol} {option_type} with URL: {urll}")
 
+    # Completed trading days are final, so they can be served from disk forever;
+    # ranges touching today stay fresh by skipping the disk layer
+    cache_path = _cache_key(**params)
+    cacheable = to_date < datetime.now().date()
+    if cacheable and cache_path.exists():
+        return pd.read_parquet(cache_path)
+
     try:
-        scraper.get("https://www.nseindia.com/", headers=headers)
-        time.sleep(1)
-        scraper.get("https://www.nseindia.com/market-data/equity-derivatives-watch", headers=headers)
-        time.sleep(1)
-
-        response = scraper.get(historical_url, params=params, headers=headers, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        data = get_json_conditional(historical_url, params, HEADERS)
         
         if "data" in data and data["data"]:
-            df = pd.DataFrame(data["data"])
-            df = df.rename(columns={
-                "FH_TIMESTAMP": "Date",
-                "FH_OPENING_PRICE": "Open",
-                "FH_TRADE_HIGH_PRICE": "High",
-                "FH_TRADE_LOW_PRICE": "Low",
-                "FH_CLOSING_PRICE": "Close",
-                "FH_LAST_TRADED_PRICE": "LTP",
-                "FH_STRIKE_PRICE": "Strike Price",
-                "FH_EXPIRY_DT": "Expiry",
-                "FH_OPTION_TYPE": "Option Type",
-                "FH_UNDERLYING_VALUE": "Underlying",
-                "FH_TOT_TRADED_QTY": "Volume",
-                "FH_OPEN_INT": "Open Interest"
-            })
+            # Project only the fields we keep while building the frame
+            df = pd.DataFrame.from_records(data["data"], columns=list(NSE_COLUMN_MAP))
+            df = df.rename(columns=NSE_COLUMN_MAP)
+
+            # Parse and sort dates once here; the chart builder and table
+            # then read an already-ordered datetime64 column
+            df['Date'] = pd.to_datetime(df['Date'], format='%d-%b-%Y', errors='coerce')
+            df.sort_values(by='Date', inplace=True, ignore_index=True)
             
             numeric_columns = ['Open', 'High', 'Low', 'Close', 'LTP', 'Strike Price', 'Underlying', 'Volume', 'Open Interest']
-            for col in numeric_columns:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            df.replace('-', pd.NA, inplace=True)
+            cols = [col for col in numeric_columns if col in df.columns]
+            # One vectorized pass; '-' placeholders coerce straight to NaN,
+            # so the old full-table replace() scan is unnecessary
+            df[cols] = df[cols].apply(pd.to_numeric, errors='coerce')
             df.dropna(subset=['Open', 'High', 'Low', 'Close'], inplace=True)
+
+            # Halve the session-state and serialization footprint: prices fit
+            # float32, volume/open interest fit nullable Int32
+            float_cols = [c for c in ('Open', 'High', 'Low', 'Close', 'LTP', 'Strike Price', 'Underlying') if c in df.columns]
+            df[float_cols] = df[float_cols].astype('float32')
+            int_cols = [c for c in ('Volume', 'Open Interest') if c in df.columns]
+            df[int_cols] = df[int_cols].astype('Int32')
+
+            if cacheable:
+                CACHE_DIR.mkdir(exist_ok=True)
+                df.to_parquet(cache_path, compression='zstd')
             return df
         else:
-            st.error("No historical options data found for the selected criteria.")
-            return None
+            # Raise rather than return None: a cached None would replay this
+            # failure until the TTL expires, even after NSE recovers
+            raise NSEFetchError("No historical options data found for the selected criteria.")
+    except NSEFetchError:
+        raise
     except Exception as e:
-        st.error(f"Error fetching options data: {str(e)}")
-        return None
+        raise NSEFetchError(f"Error fetching options data: {str(e)}") from e
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _build_chart_json(df, expiry, strike, symbol, chart_type):
+    """Build the candlestick figure and return it serialized; cached so
+    unrelated reruns (e.g. typing in the table search box) reuse it.
+    Dates arrive already parsed and sorted from fetch_nse_data."""
+    fig = go.Figure()
+    if all(col in df.columns for col in ['Open', 'High', 'Low', 'Close']):
+        fig.add_trace(go.Candlestick(
+            x=df['Date'],
+            open=df['Open'],
+            high=df['High'],
+            low=df['Low'],
+            close=df['Close'],
+            name=f'{chart_type} Candlestick',
+            increasing=dict(line=dict(color='#26a69a')),
+            decreasing=dict(line=dict(color='#ef5350'))
+        ))
+
+    title = f'{symbol} - {chart_type} Chart'
+    if chart_type == "Option":
+        title += f'<br>Strike Price: {strike}<br>Expiry: {expiry.strftime("%d-%b-%Y")}'
+
+    fig.update_layout(
+        title=title,
+        xaxis_title='Date',
+        yaxis_title='Price',
+        plot_bgcolor='#1e1e1e',
+        paper_bgcolor='#1e1e1e',
+        font=dict(color='white'),
+        xaxis=dict(
+            gridcolor='#333',
+            rangeslider_visible=False,
+            showspikes=True,
+            type='date',
+            # Collapse non-trading weekend gaps client-side rather than
+            # rendering empty ticks for them
+            rangebreaks=[dict(bounds=["sat", "mon"])]
+        ),
+        yaxis=dict(gridcolor='#333'),
+        dragmode='pan',
+        autosize=True,
+        height=600,
+        uirevision='fixed'
+    )
+    return fig.to_json()
 
 def create_candlestick_chart(df, expiry, strike, symbol, chart_type="Option"):
     """Create a candlestick chart using Plotly for options data."""
@@ -238,42 +443,8 @@ def create_candlestick_chart(df, expiry, strike, symbol, chart_type="Option"):
         if df.empty:
             st.warning(f"No {chart_type.lower()} data available for the selected criteria.")
             return None
-        
-        if 'Date' in df.columns:
-            df['Date'] = pd.to_datetime(df['Date'], format='%d-%b-%Y', errors='coerce')
-            df.sort_values(by='Date', inplace=True)
-        
-        fig = go.Figure()
-        if all(col in df.columns for col in ['Open', 'High', 'Low', 'Close']):
-            fig.add_trace(go.Candlestick(
-                x=df['Date'],
-                open=df['Open'],
-                high=df['High'],
-                low=df['Low'],
-                close=df['Close'],
-                name=f'{chart_type} Candlestick',
-                increasing=dict(line=dict(color='#26a69a')),
-                decreasing=dict(line=dict(color='#ef5350'))
-            ))
-        
-        title = f'{symbol} - {chart_type} Chart'
-        if chart_type == "Option":
-            title += f'<br>Strike Price: {strike}<br>Expiry: {expiry.strftime("%d-%b-%Y")}'
-        
-        fig.update_layout(
-            title=title,
-            xaxis_title='Date',
-            yaxis_title='Price',
-            plot_bgcolor='#1e1e1e',
-            paper_bgcolor='#1e1e1e',
-            font=dict(color='white'),
-            xaxis=dict(gridcolor='#333', rangeslider_visible=False, showspikes=True),
-            yaxis=dict(gridcolor='#333'),
-            dragmode='pan',
-            autosize=True,
-            height=600
-        )
-        return fig
+
+        return json.loads(_build_chart_json(df, expiry, strike, symbol, chart_type))
     except Exception as e:
         st.error(f"Error creating {chart_type.lower()} chart: {str(e)}")
         return None
@@ -288,12 +459,17 @@ def display_data_table(df):
     
     search_term = st.text_input("Search Table", placeholder="Enter search term...")
     
-    filtered_df = df.copy()
+    filtered_df = df
     if search_term:
-        search_term = search_term.lower()
-        filtered_df = filtered_df[
-            filtered_df.apply(lambda row: row.astype(str).str.lower().str.contains(search_term).any(), axis=1)
-        ]
+        # Build one lowercase haystack string per row, cached in session
+        # state; the search is then a single vectorized substring scan
+        # instead of a Python-level walk over every row and column
+        haystack_key = (id(df), len(df))
+        if st.session_state.get('_table_haystack_key') != haystack_key:
+            st.session_state._table_haystack = df.astype(str).apply(lambda s: s.str.lower()).agg(' '.join, axis=1)
+            st.session_state._table_haystack_key = haystack_key
+        mask = st.session_state._table_haystack.str.contains(search_term.lower(), regex=False, na=False)
+        filtered_df = df[mask]
     
     display_columns = ['Date', 'Open', 'High', 'Low', 'Close', 'LTP', 'Strike Price', 'Option Type', 'Underlying', 'Volume', 'Open Interest']
     display_df = filtered_df[display_columns].copy()
@@ -303,7 +479,8 @@ def display_data_table(df):
             display_df[col] = display_df[col].round(2)
     
     if 'Date' in display_df.columns:
-        display_df['Date'] = pd.to_datetime(display_df['Date'], format='%d-%b-%Y', errors='coerce').dt.strftime('%d-%b-%Y')
+        # Already datetime64 from fetch_nse_data; just format for display
+        display_df['Date'] = display_df['Date'].dt.strftime('%d-%b-%Y')
     
     st.dataframe(
         display_df,
@@ -358,13 +535,17 @@ def main():
     if 'strike_prices' not in st.session_state:
         st.session_state.strike_prices = [0]
     
-    # Fetch strike prices when inputs change
+    # Fetch strike prices only when one of their actual inputs changed;
+    # unrelated widgets (option type, table search) no longer trigger a refetch
     if symbol and instrument_type and expiry_date and to_date:
-        try:
-            st.session_state.strike_prices = fetch_strike_prices(symbol, expiry_date, instrument_type, selected_date_range_days, to_date)
-        except Exception as e:
-            st.error(f"Error fetching strike prices: {str(e)}")
-            st.session_state.strike_prices = [0]
+        strike_key = (symbol, expiry_date.isoformat(), instrument_type, selected_date_range_days, to_date.isoformat())
+        if st.session_state.get('_last_strike_key') != strike_key:
+            try:
+                st.session_state.strike_prices = fetch_strike_prices(symbol, expiry_date, instrument_type, selected_date_range_days, to_date)
+                st.session_state._last_strike_key = strike_key
+            except Exception as e:
+                st.error(f"Error fetching strike prices: {str(e)}")
+                st.session_state.strike_prices = [0]
     
     strike_price = st.selectbox("Strike Price *", options=st.session_state.strike_prices, index=0, key="strike_price")
     
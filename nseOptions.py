@@ -2,13 +2,27 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import aiohttp
+import asyncio
+import copy
+import functools
+import hashlib
+import json
+import orjson
+import pathlib
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+# plotly is imported lazily inside the chart builder: it costs ~300 ms and
+# is only needed once the user clicks "Run Backtest"
 
-# Global session for NSE requests
+# Global session for NSE requests; the lock keeps lazy init safe when the
+# sell and buy legs are fetched from worker threads
 nse_session = None
+_session_lock = threading.Lock()
 
 # Headers for NSE requests
 headers = {
@@ -19,179 +33,413 @@ headers = {
 }
 
 # Initialize NSE session
-def initialize_nse_session():
+def initialize_nse_session(force=False):
     global nse_session
-    if nse_session is None:
-        nse_session = requests.Session()
-        try:
-            response = nse_session.get("https://www.nseindia.com/", headers=headers)
-            if response.status_code != 200:
-                st.error(f"Failed to load homepage: {response.status_code}")
-                return False
-            time.sleep(2)
-            response = nse_session.get("https://www.nseindia.com/market-data/equity-derivatives-watch", headers=headers)
-            time.sleep(5)
-            if response.status_code != 200:
-                st.error(f"Failed to load derivatives page: {response.status_code}")
+    with _session_lock:
+        if force:
+            nse_session = None
+            try:
+                st.session_state.pop('nse_session', None)
+            except Exception:
+                pass  # worker threads have no script context
+        if nse_session is None:
+            # Script reruns reset module globals, so first try the warmed
+            # session kept in st.session_state; a cheap probe confirms its
+            # cookies still work before we skip the full warm-up
+            try:
+                cached = st.session_state.get('nse_session')
+            except Exception:
+                cached = None  # worker threads have no script context
+            if cached is not None:
+                try:
+                    probe = cached.get("https://www.nseindia.com/api/marketStatus", headers=headers, timeout=3)
+                    if probe.status_code == 200:
+                        nse_session = cached
+                        return True
+                except Exception:
+                    pass  # probe failed; fall through to a fresh warm-up
+            session = requests.Session()
+            # Pooled adapter keeps sockets warm for the parallel leg fetches
+            # and retries transient failures with back-off at the transport
+            # layer, so callers need no retry loops of their own
+            session.mount("https://", HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=10,
+                max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+            ))
+            try:
+                response = session.get("https://www.nseindia.com/", headers=headers)
+                if response.status_code != 200:
+                    st.error(f"Failed to load homepage: {response.status_code}")
+                    return False
+                # The homepage GET normally sets the cookie wall's tokens;
+                # only fall back to the derivatives page when it did not
+                if 'nsit' not in session.cookies:
+                    response = session.get("https://www.nseindia.com/market-data/equity-derivatives-watch", headers=headers)
+                    if response.status_code != 200:
+                        st.error(f"Failed to load derivatives page: {response.status_code}")
+                        return False
+            except Exception as e:
+                st.error(f"Session initialization failed: {str(e)}")
                 return False
-        except Exception as e:
-            st.error(f"Session initialization failed: {str(e)}")
-            return False
+            nse_session = session
+            try:
+                st.session_state['nse_session'] = session
+            except Exception:
+                pass  # worker threads have no script context
     return True
 
-# Fetch historical data
-def fetch_historical_data(from_date, to_date, symbol, year, expiry_date, option_type, strike_price, instrument_type="OPTIDX"):
-    if not initialize_nse_session():
-        return None
-    from_date_str = from_date.strftime("%d-%m-%Y")
-    to_date_str = to_date.strftime("%d-%m-%Y")
-    expiry_date_str = expiry_date.strftime("%d-%b-%Y").upper()
-    params = {
-        "from": from_date_str,
-        "to": to_date_str,
+# On-disk cache for NSE historical responses; data for past expiries is
+# immutable, so it never goes stale
+_cache_dir = pathlib.Path(".cache/nse_hist")
+
+api_url = "https://www.nseindia.com/api/historicalOR/foCPV"
+
+def build_request_params(from_date, to_date, symbol, year, expiry_date, option_type, strike_price, instrument_type):
+    return {
+        "from": from_date.strftime("%d-%m-%Y"),
+        "to": to_date.strftime("%d-%m-%Y"),
         "instrumentType": instrument_type,
         "symbol": symbol,
         "year": str(year),
-        "expiryDate": expiry_date_str,
+        "expiryDate": expiry_date.strftime("%d-%b-%Y").upper(),
         "optionType": option_type,
         "strikePrice": str(strike_price)
     }
+
+def load_cached_response(cache_path, expiry_date):
+    # Past-expiry contracts never trade again, so their entries are kept
+    # indefinitely; live expiries refresh after an hour
+    cache_ttl = float('inf') if expiry_date < datetime.now().date() else 3600
+    if cache_path.exists() and (time.time() - cache_path.stat().st_mtime) < cache_ttl:
+        try:
+            return pd.read_parquet(cache_path)
+        except Exception:
+            pass  # corrupt cache file; fall through and refetch
+    return None
+
+def store_cached_response(cache_path, df):
     try:
-        with st.spinner("Fetching historical data..."):
-            response = nse_session.get(
-                "https://www.nseindia.com/api/historicalOR/foCPV",
-                params=params,
-                headers=headers,
-                cookies=nse_session.cookies.get_dict()
-            )
-            time.sleep(1)
-            if response.status_code == 200:
-                data = response.json()
-                df = pd.DataFrame(data.get('data', []))
-                if df.empty:
-                    st.error(f"No historical data returned for strike {strike_price}.")
-                    return None
-                return df
-            else:
-                st.error(f"Failed to fetch historical data: {response.status_code}")
-                return None
+        _cache_dir.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(cache_path)
+    except Exception:
+        pass  # caching is best-effort; parquet write must not fail the fetch
+
+def cache_path_for(params):
+    key = hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    return _cache_dir / f"{key}.parquet"
+
+# "No data" answers are cached as empty sentinel files so dense strike
+# sweeps stop re-querying illiquid strikes; six hours for live expiries,
+# forever once the contract has expired
+def negative_sentinel_fresh(cache_path, expiry_date):
+    sentinel = cache_path.with_suffix('.empty')
+    cache_ttl = float('inf') if expiry_date < datetime.now().date() else 21600
+    return sentinel.exists() and (time.time() - sentinel.stat().st_mtime) < cache_ttl
+
+def store_negative_sentinel(cache_path):
+    try:
+        _cache_dir.mkdir(parents=True, exist_ok=True)
+        cache_path.with_suffix('.empty').touch()
+    except Exception:
+        pass  # best-effort, like the parquet writes
+
+# Numeric fields the foCPV endpoint serves as strings
+_NUMERIC_FIELDS = (
+    'FH_OPENING_PRICE', 'FH_TRADE_HIGH_PRICE', 'FH_TRADE_LOW_PRICE',
+    'FH_CLOSING_PRICE', 'FH_LAST_TRADED_PRICE', 'FH_PREV_CLS',
+    'FH_SETTLE_PRICE', 'FH_STRIKE_PRICE', 'FH_UNDERLYING_VALUE',
+    'FH_OPEN', 'FH_HIGH', 'FH_LOW', 'FH_CLOSE', 'FH_LAST', 'FH_LTP',
+    'OPEN', 'HIGH', 'LOW', 'CLOSE', 'LAST', 'LTP',
+    'FH_TOT_TRADED_QTY', 'FH_TOT_TRADED_VAL', 'FH_OPEN_INT', 'FH_CHANGE_IN_OI'
+)
+
+# Close-price candidates in preference order (raw and FH_-aliased forms)
+_CLOSE_CANDS = ('FH_CLOSE', 'CLOSE', 'FH_LAST', 'LAST', 'FH_LTP', 'LTP')
+
+# Bare column names the chart builder aliases to FH_-prefixed ones
+_ALIAS_COLS = ('OPEN', 'HIGH', 'LOW', 'CLOSE', 'LAST', 'LTP')
+
+# Columns a candlestick trace needs
+_REQUIRED = frozenset(('FH_OPEN', 'FH_HIGH', 'FH_LOW', 'FH_CLOSE', 'FH_TIMESTAMP'))
+
+def prepare_frame(df, cache_path):
+    # Shared post-processing for both fetch paths
+    numeric_cols = [c for c in _NUMERIC_FIELDS if c in df.columns]
+    # Coerce once at ingest: st.dataframe's Arrow export then hands off
+    # numeric buffers instead of re-encoding strings, and the P/L math
+    # sees real floats
+    df[numeric_cols] = df[numeric_cols].apply(lambda s: pd.to_numeric(s, errors='coerce').astype('float32'))
+    if 'FH_TIMESTAMP' in df.columns:
+        # Parse dates once at C speed; plotly.js otherwise re-parses the raw
+        # strings per trace, and ISO timestamps serialize smaller too
+        df['FH_TIMESTAMP'] = pd.to_datetime(df['FH_TIMESTAMP'], format='%d-%b-%Y', cache=True, errors='coerce')
+    df.attrs['close_col'] = next((c for c in _CLOSE_CANDS if c in df.columns), None)
+    store_cached_response(cache_path, df)
+    return df
+
+class NSEFetchError(Exception):
+    """Transient fetch failure. Raised (not returned) so st.cache_data never
+    memoizes an error; only successful frames and deliberate no-data
+    sentinels are cached."""
+
+# Fetch historical data. Runs in worker threads, which cannot touch st.*,
+# so failures come back as (level, message) pairs for the caller to emit,
+# and transient errors raise NSEFetchError for the caller to catch.
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_historical_data(from_date, to_date, symbol, year, expiry_date, option_type, strike_price, instrument_type="OPTIDX"):
+    messages = []
+    if not initialize_nse_session():
+        raise NSEFetchError("Could not initialize NSE session.")
+    params = build_request_params(from_date, to_date, symbol, year, expiry_date, option_type, strike_price, instrument_type)
+    cache_path = cache_path_for(params)
+    cached = load_cached_response(cache_path, expiry_date)
+    if cached is not None:
+        return cached, messages
+    if negative_sentinel_fresh(cache_path, expiry_date):
+        messages.append(('error', f"No historical data returned for strike {strike_price}."))
+        return None, messages
+    try:
+        # Throttling and transient 5xx retries happen in the session's
+        # HTTPAdapter; only stale cookies are handled here, since they need
+        # a forced re-warm rather than a plain retry
+        response = nse_session.get(api_url, params=params, headers=headers)
+        if response.status_code in (401, 403) and initialize_nse_session(force=True):
+            response = nse_session.get(api_url, params=params, headers=headers)
     except Exception as e:
-        st.error(f"Error fetching historical data: {str(e)}")
-        return None
+        raise NSEFetchError(f"Error fetching historical data: {str(e)}") from e
+    if response.status_code != 200:
+        raise NSEFetchError(f"Failed to fetch historical data: {response.status_code}")
+    # orjson decodes the body in one pass and from_records skips the
+    # dict-per-row Series construction the plain constructor falls into
+    data = orjson.loads(response.content)
+    df = pd.DataFrame.from_records(data.get('data', []))
+    if df.empty:
+        store_negative_sentinel(cache_path)
+        messages.append(('error', f"No historical data returned for strike {strike_price}."))
+        return None, messages
+    return prepare_frame(df, cache_path), messages
+
+def create_async_session():
+    # aiohttp session sharing the warmed requests session's NSE cookies;
+    # keep-alive means multi-leg sweeps pay the TCP+TLS handshake once
+    jar = aiohttp.CookieJar()
+    if nse_session is not None:
+        jar.update_cookies(nse_session.cookies.get_dict())
+    return aiohttp.ClientSession(
+        headers=headers,
+        cookie_jar=jar,
+        timeout=aiohttp.ClientTimeout(total=30)
+    )
+
+# Async counterpart of fetch_historical_data for sweeping many strikes over
+# one keep-alive connection; same (df, messages) contract and same disk cache
+async def fetch_historical_data_async(session, from_date, to_date, symbol, year, expiry_date, option_type, strike_price, instrument_type="OPTIDX"):
+    messages = []
+    params = build_request_params(from_date, to_date, symbol, year, expiry_date, option_type, strike_price, instrument_type)
+    cache_path = cache_path_for(params)
+    cached = load_cached_response(cache_path, expiry_date)
+    if cached is not None:
+        return cached, messages
+    if negative_sentinel_fresh(cache_path, expiry_date):
+        messages.append(('error', f"No historical data returned for strike {strike_price}."))
+        return None, messages
+    try:
+        async with session.get(api_url, params=params) as response:
+            if response.status != 200:
+                messages.append(('error', f"Failed to fetch historical data: {response.status}"))
+                return None, messages
+            data = await response.json(loads=orjson.loads)
+        df = pd.DataFrame.from_records(data.get('data', []))
+        if df.empty:
+            store_negative_sentinel(cache_path)
+            messages.append(('error', f"No historical data returned for strike {strike_price}."))
+            return None, messages
+        return prepare_frame(df, cache_path), messages
+    except Exception as e:
+        messages.append(('error', f"Error fetching historical data: {str(e)}"))
+        return None, messages
+
+# Fetch a whole strike grid concurrently, returning (df, messages) pairs in
+# strike order. The semaphore caps in-flight requests so NSE's rate limits
+# are respected; strikes already in the disk cache resolve without taking a
+# slot at all.
+async def fetch_many(strikes, from_date, to_date, symbol, year, expiry_date, option_type, instrument_type="OPTIDX", max_concurrency=8):
+    sem = asyncio.Semaphore(max_concurrency)
+    async with create_async_session() as session:
+        async def fetch_one(strike_price):
+            params = build_request_params(from_date, to_date, symbol, year, expiry_date, option_type, strike_price, instrument_type)
+            cached = load_cached_response(cache_path_for(params), expiry_date)
+            if cached is not None:
+                return cached, []
+            async with sem:
+                return await fetch_historical_data_async(session, from_date, to_date, symbol, year, expiry_date, option_type, strike_price, instrument_type)
+
+        return await asyncio.gather(*(fetch_one(strike) for strike in strikes))
+
+def detect_close_col(df):
+    # Fetch-time detection rides along in df.attrs; fall back to scanning
+    # when it is missing (parquet round trips drop attrs) or was renamed
+    close_col = df.attrs.get('close_col')
+    if close_col is None or close_col not in df.columns:
+        close_col = next((c for c in _CLOSE_CANDS if c in df.columns), None)
+    return close_col
+
+# Content hash for DataFrame cache keys (frames are not hashable by default)
+_df_hash = {pd.DataFrame: lambda df: hashlib.md5(pd.util.hash_pandas_object(df).values).digest()}
+
+def pnl_kernel(sell_closes, buy_closes, quantity):
+    # Entry/exit net premium to P/L on raw arrays. 1-D input gives one
+    # scalar per leg pair; stacking legs column-wise (days x scenarios)
+    # sweeps a whole strike grid in the same vectorized call.
+    sell_closes = np.asarray(sell_closes)
+    buy_closes = np.asarray(buy_closes)
+    initial_net = sell_closes[0] - buy_closes[0]
+    final_net = sell_closes[-1] - buy_closes[-1]
+    return initial_net, final_net, (initial_net - final_net) * quantity
 
 # Calculate P/L
+@st.cache_data(ttl=3600, show_spinner=False, hash_funcs=_df_hash)
 def calculate_credit_spread_pnl(sell_df, buy_df, sell_strike, buy_strike, quantity):
-    close_col = next((col for col in ['FH_CLOSE', 'CLOSE', 'LAST', 'LTP'] if col in sell_df.columns and col in buy_df.columns), None)
-    if not close_col:
+    close_col = detect_close_col(sell_df)
+    if not close_col or close_col != detect_close_col(buy_df):
         return None, "Missing close price column for P/L calculation"
-    
-    initial_sell_premium = sell_df[close_col].iloc[0]
-    initial_buy_premium = buy_df[close_col].iloc[0]
-    initial_net_premium = initial_sell_premium - initial_buy_premium
-    
-    final_sell_premium = sell_df[close_col].iloc[-1]
-    final_buy_premium = buy_df[close_col].iloc[-1]
-    final_net_premium = final_sell_premium - final_buy_premium
-    
-    pnl = (initial_net_premium - final_net_premium) * quantity
+
+    # Both legs share the same trading dates, so pandas index alignment
+    # would only add hashing overhead
+    initial_net_premium, final_net_premium, pnl = pnl_kernel(
+        sell_df[close_col].to_numpy(), buy_df[close_col].to_numpy(), quantity)
     return pnl, f"Initial Net Premium: {initial_net_premium:.2f}, Final Net Premium: {final_net_premium:.2f}, P/L: {pnl:.2f}"
 
-# Create candlestick charts
-def create_candlestick_charts(sell_df, buy_df, sell_strike, buy_strike, quantity):
-    close_col = next((col for col in ['FH_CLOSE', 'CLOSE', 'LAST', 'LTP'] if col in sell_df.columns and col in buy_df.columns), None)
-    if not close_col:
-        return None
-    
-    # Map alternative columns
-    for df in [sell_df, buy_df]:
-        for col in ['OPEN', 'HIGH', 'LOW', 'CLOSE', 'LAST', 'LTP']:
-            if col in df.columns and 'FH_' + col not in df.columns:
-                df['FH_' + col] = df[col]
-    
-    # Check for candlestick columns
-    required_cols = ['FH_OPEN', 'FH_HIGH', 'FH_LOW', 'FH_CLOSE', 'FH_TIMESTAMP']
-    if not all(col in sell_df.columns for col in required_cols) or not all(col in buy_df.columns for col in required_cols):
-        st.warning("Missing required columns for candlestick charts.")
-        return None
-    
+@functools.lru_cache(maxsize=1)
+def _subplot_layout():
+    import plotly.io as pio
+    from plotly.subplots import make_subplots
+
+    # orjson encodes the NumPy trace buffers in C instead of walking them
+    # element by element; set once here, where plotly first loads
+    pio.json.config.default_engine = 'orjson'
+
+    # Run make_subplots' validated layout construction once per process;
+    # the per-call path deep-copies this dict and fills in the titles.
+    # Titles 3 and 4 are fixed, 1 and 2 carry the strikes.
     fig = make_subplots(
         rows=2, cols=2,
-        subplot_titles=[
-            f"Sell Call ({sell_strike} CE) Candlestick",
-            f"Buy Call ({buy_strike} CE) Candlestick",
-            "Credit Spread P/L",
-            "Open Interest"
-        ],
+        subplot_titles=["sell", "buy", "Credit Spread P/L", "Open Interest"],
         row_heights=[0.5, 0.5],
         specs=[[{"type": "candlestick"}, {"type": "candlestick"}], [{"type": "xy"}, {"type": "xy"}]]
     )
+    return fig.to_dict()['layout']
+
+# Create candlestick charts. Pure in its inputs (the frames are aliased and
+# downcast on local copies), so reruns with the same legs hit the cache.
+@st.cache_data(ttl=3600, show_spinner=False, hash_funcs=_df_hash)
+def create_candlestick_charts(sell_df, buy_df, sell_strike, buy_strike, quantity):
+    import plotly.graph_objects as go
+
+    # Map alternative columns in one rename per frame (a metadata update,
+    # not six Series writes) and keep the caller's frames unmutated
+    def alias_columns(df):
+        # One set build keeps every membership test O(1) instead of an
+        # Index scan per lookup
+        cols = set(df.columns)
+        mapping = {col: 'FH_' + col for col in _ALIAS_COLS
+                   if col in cols and 'FH_' + col not in cols}
+        return df.rename(columns=mapping) if mapping else df
+
+    sell_df = alias_columns(sell_df)
+    buy_df = alias_columns(buy_df)
+
+    # Detect after aliasing, so bare CLOSE/LAST/LTP sources are covered too
+    close_col = detect_close_col(sell_df)
+    if not close_col or close_col != detect_close_col(buy_df):
+        return None
     
-    # Sell Call Candlestick
-    fig.add_trace(
-        go.Candlestick(
-            x=sell_df['FH_TIMESTAMP'],
-            open=sell_df['FH_OPEN'],
-            high=sell_df['FH_HIGH'],
-            low=sell_df['FH_LOW'],
-            close=sell_df['FH_CLOSE'],
-            name=f"Sell {sell_strike} CE"
-        ),
-        row=1, col=1
-    )
-    
-    # Buy Call Candlestick
-    fig.add_trace(
-        go.Candlestick(
-            x=buy_df['FH_TIMESTAMP'],
-            open=buy_df['FH_OPEN'],
-            high=buy_df['FH_HIGH'],
-            low=buy_df['FH_LOW'],
-            close=buy_df['FH_CLOSE'],
-            name=f"Buy {buy_strike} CE"
-        ),
-        row=1, col=2
-    )
-    
-    # P/L
-    net_premium = sell_df[close_col] - buy_df[close_col]
-    fig.add_trace(
-        go.Scatter(
-            x=sell_df['FH_TIMESTAMP'],
-            y=net_premium * quantity,
-            name="Net Premium (P/L)",
-            line=dict(color='blue')
-        ),
-        row=2, col=1
-    )
-    
+    # Check for candlestick columns with one subset test per frame
+    if not _REQUIRED.issubset(sell_df.columns) or not _REQUIRED.issubset(buy_df.columns):
+        st.warning("Missing required columns for candlestick charts.")
+        return None
+
+    # float32 is ample for display precision and halves the bytes plotly
+    # serializes per sample; OI gets the nullable Int32 treatment since
+    # coercion can surface missing values
+    def downcast_numeric(df):
+        price_cols = [c for c in ('FH_OPEN', 'FH_HIGH', 'FH_LOW', 'FH_CLOSE', 'FH_LAST', 'FH_LTP') if c in df.columns]
+        df[price_cols] = df[price_cols].apply(lambda s: pd.to_numeric(s, errors='coerce').astype('float32'))
+        if 'FH_OPEN_INT' in df.columns:
+            df['FH_OPEN_INT'] = pd.to_numeric(df['FH_OPEN_INT'], errors='coerce').astype('Int32')
+        return df
+
+    sell_df = downcast_numeric(sell_df)
+    buy_df = downcast_numeric(buy_df)
+
+    # Build the figure from a pre-validated dict: the 2x2 shape is fixed, so
+    # the make_subplots + add_trace validation walk is paid once per process
+    # (in _subplot_layout) instead of on every run
+    layout = copy.deepcopy(_subplot_layout())
+    annotations = layout['annotations']
+    annotations[0]['text'] = f"Sell Call ({sell_strike} CE) Candlestick"
+    annotations[1]['text'] = f"Buy Call ({buy_strike} CE) Candlestick"
+    layout['height'] = 800
+    layout['width'] = 1200
+    layout['showlegend'] = True
+    layout['title'] = {'text': "Credit Call Spread Backtest"}
+
+    # P/L (raw arrays: same dates on both legs, so skip index alignment)
+    net_premium = sell_df[close_col].to_numpy(copy=False) - buy_df[close_col].to_numpy(copy=False)
+
+    # Subplots map to axis pairs x/y (1,1), x2/y2 (1,2), x3/y3 (2,1), x4/y4 (2,2)
+    data = [
+        {
+            'type': 'candlestick',
+            'x': sell_df['FH_TIMESTAMP'].to_numpy(copy=False),
+            'open': sell_df['FH_OPEN'].to_numpy(copy=False),
+            'high': sell_df['FH_HIGH'].to_numpy(copy=False),
+            'low': sell_df['FH_LOW'].to_numpy(copy=False),
+            'close': sell_df['FH_CLOSE'].to_numpy(copy=False),
+            'name': f"Sell {sell_strike} CE",
+            'xaxis': 'x', 'yaxis': 'y'
+        },
+        {
+            'type': 'candlestick',
+            'x': buy_df['FH_TIMESTAMP'].to_numpy(copy=False),
+            'open': buy_df['FH_OPEN'].to_numpy(copy=False),
+            'high': buy_df['FH_HIGH'].to_numpy(copy=False),
+            'low': buy_df['FH_LOW'].to_numpy(copy=False),
+            'close': buy_df['FH_CLOSE'].to_numpy(copy=False),
+            'name': f"Buy {buy_strike} CE",
+            'xaxis': 'x2', 'yaxis': 'y2'
+        },
+        {
+            'type': 'scatter',
+            'x': sell_df['FH_TIMESTAMP'].to_numpy(copy=False),
+            'y': net_premium * quantity,
+            'name': "Net Premium (P/L)",
+            'line': {'color': 'blue'},
+            'xaxis': 'x3', 'yaxis': 'y3'
+        }
+    ]
+
     # Open Interest
     if 'FH_OPEN_INT' in sell_df.columns and 'FH_OPEN_INT' in buy_df.columns:
-        fig.add_trace(
-            go.Scatter(
-                x=sell_df['FH_TIMESTAMP'],
-                y=sell_df['FH_OPEN_INT'],
-                name=f"Sell {sell_strike} OI",
-                line=dict(color='orange')
-            ),
-            row=2, col=2
-        )
-        fig.add_trace(
-            go.Scatter(
-                x=buy_df['FH_TIMESTAMP'],
-                y=buy_df['FH_OPEN_INT'],
-                name=f"Buy {buy_strike} OI",
-                line=dict(color='green')
-            ),
-            row=2, col=2
-        )
-    
-    fig.update_layout(
-        height=800,
-        width=1200,
-        showlegend=True,
-        title_text="Credit Call Spread Backtest"
-    )
-    return fig
+        data.append({
+            'type': 'scatter',
+            'x': sell_df['FH_TIMESTAMP'].to_numpy(copy=False),
+            'y': sell_df['FH_OPEN_INT'].to_numpy(dtype='float32', na_value=float('nan')),
+            'name': f"Sell {sell_strike} OI",
+            'line': {'color': 'orange'},
+            'xaxis': 'x4', 'yaxis': 'y4'
+        })
+        data.append({
+            'type': 'scatter',
+            'x': buy_df['FH_TIMESTAMP'].to_numpy(copy=False),
+            'y': buy_df['FH_OPEN_INT'].to_numpy(dtype='float32', na_value=float('nan')),
+            'name': f"Buy {buy_strike} OI",
+            'line': {'color': 'green'},
+            'xaxis': 'x4', 'yaxis': 'y4'
+        })
+
+    return go.Figure({'data': data, 'layout': layout}, skip_invalid=True)
 
 # Main app
 st.title("Nifty 50 Credit Call Spread Backtester")
@@ -215,8 +463,24 @@ with col5:
 
 if st.button("Run Backtest"):
     with st.spinner("Running backtest..."):
-        sell_df = fetch_historical_data(start_date, expiry_date, "NIFTY", 2025, expiry_date, "CE", sell_strike)
-        buy_df = fetch_historical_data(start_date, expiry_date, "NIFTY", 2025, expiry_date, "CE", buy_strike)
+        # Prime the session on the main thread so workers never hit the
+        # init path, then fetch both legs concurrently; each spends most
+        # of its time waiting on NSE, so the second leg is nearly free
+        if not initialize_nse_session():
+            st.stop()
+        try:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                sell_future = executor.submit(fetch_historical_data, start_date, expiry_date, "NIFTY", 2025, expiry_date, "CE", sell_strike)
+                buy_future = executor.submit(fetch_historical_data, start_date, expiry_date, "NIFTY", 2025, expiry_date, "CE", buy_strike)
+                sell_df, sell_messages = sell_future.result()
+                buy_df, buy_messages = buy_future.result()
+        except NSEFetchError as e:
+            # Transient failure: nothing was cached, so the next click refetches
+            st.error(str(e))
+            sell_df = buy_df = None
+            sell_messages = buy_messages = []
+        for level, message in sell_messages + buy_messages:
+            getattr(st, level)(message)
         if sell_df is not None and buy_df is not None:
             # P/L Calculation
             pnl, message = calculate_credit_spread_pnl(sell_df, buy_df, sell_strike, buy_strike, quantity)